@@ -1,3 +1,6 @@
+import pickle
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pandas as pd
@@ -42,107 +45,438 @@ st.markdown(
 
 
 # Helper functions
-def parse_floor_data(floor_str):
-    """Parse floor data string like '#05:1; #06:1' to extract floors and counts"""
-    if pd.isna(floor_str) or floor_str == '':
-        return []
-
-    floors = []
-    parts = floor_str.split(';')
-    for part in parts:
-        part = part.strip()
-        if ':' in part:
-            floor_num, count = part.split(':')
-            floor_num = floor_num.replace('#', '').strip()
-            try:
-                count = int(count.strip())
-                floors.append({'floor': floor_num, 'count': count})
-            except:
-                pass
-    return floors
-
-
-def get_total_units_from_floor_data(floor_str):
-    """Calculate total units from floor data string"""
-    floors = parse_floor_data(floor_str)
-    return sum(f['count'] for f in floors)
+def parse_floor_series(s: pd.Series) -> pd.DataFrame:
+    """Parse floor data strings like '#05:1; #06:1' into one row per floor
+
+    The result is indexed by (row label of s, match number), so all floors
+    parsed from one string can be selected with .loc[row_label].
+    """
+    return s.str.extractall(r'#(?P<floor>[^:;]+):(?P<count>\d+)').astype(
+        {'count': 'int32'}
+    )
+
+
+COMPLETION_YEAR_PATTERN = re.compile(r'(20\d{2})')
+
+
+def categorize_completion_series(s: pd.Series) -> pd.Series:
+    """Categorize completion dates as 'Unknown', 'Available Now' or the year"""
+    return (
+        s.str.extract(COMPLETION_YEAR_PATTERN, expand=False)
+        .fillna(s)
+        .mask(s.str.contains('Keys available|Completed', na=False), 'Available Now')
+        .mask(s.isna() | (s == ''), 'Unknown')
+    )
+
+
+def completion_year_categorical(s: pd.Series) -> pd.Series:
+    """Completion years as an ordered category: 'Available Now', years, 'Unknown'"""
+    years = categorize_completion_series(s)
+    others = sorted(set(years.dropna()) - {'Available Now', 'Unknown'})
+    return years.astype(
+        pd.CategoricalDtype(['Available Now', *others, 'Unknown'], ordered=True)
+    )
+
+
+ROOM_COLUMNS = ['2-room Flexi', '3-room', '3Gen', '4-room', '5-room', 'Executive']
+ESTATE_COLUMNS = [
+    'Project Name',
+    'Town',
+    'Remaining Lease',
+    'Probable Completion',
+    *ROOM_COLUMNS,
+    'Latitude',
+    'Longitude',
+    'Nearest_MRT',
+    'MRT_Station_Code',
+    'Walk_Distance_m',
+    'Walk_Duration_min',
+    'bus_duration_min',
+    'URL',
+]
+PROJECT_COLUMNS = ['flat_type', 'block', 'ethnicity', 'floor_data', 'price_range']
+FLOOR_PRICE_COLUMNS = [
+    'flat_type',
+    'ethnicity',
+    'blocks',
+    'floor_summary',
+    'total_units',
+    'price_range',
+]
+PROJECT_INDEX = ['project_name', 'flat_type', 'ethnicity']
+CACHE_DIR = Path('.cache')
+# Threads used to read data files; pyarrow releases the GIL while reading
+MAX_READ_WORKERS = 8
+# Projects beyond this many are rolled up into one 'Others' bar
+MAX_PROJECT_BARS = 20
+
+
+def data_mtime(*base_paths):
+    """Path and modification time of every Parquet file under base_paths
+
+    The sorted (path, mtime) pairs change when a file is edited, added,
+    removed or renamed. This script's own mtime is included so that loader
+    changes also invalidate the pickled caches.
+    """
+    mtimes = sorted(
+        (str(p), p.stat().st_mtime)
+        for base_path in base_paths
+        for p in Path(base_path).rglob('*.parquet')
+    )
+    return (Path(__file__).stat().st_mtime, *mtimes)
+
+
+def read_pickle_cache(name, cache_key):
+    """Return the pickled loader result if it was written for cache_key, else None"""
+    cache_file = CACHE_DIR / f'{name}.pkl'
+    if cache_file.exists():
+        try:
+            with cache_file.open('rb') as f:
+                cached = pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # A truncated pickle, or one from other pandas/pyarrow versions,
+            # is read from the files again and then overwritten
+            return None
+        if isinstance(cached, dict) and cached.get('cache_key') == cache_key:
+            return cached['data']
+    return None
+
+
+def write_pickle_cache(name, cache_key, data):
+    """Pickle a loader result so the next cold start can skip reading files"""
+    cache_file = CACHE_DIR / f'{name}.pkl'
+    tmp_file = cache_file.with_suffix('.tmp')
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        with tmp_file.open('wb') as f:
+            pickle.dump({'cache_key': cache_key, 'data': data}, f, protocol=5)
+        tmp_file.replace(cache_file)
+    except OSError:
+        # The cache is only an optimisation, e.g. on a read-only filesystem
+        pass
+
+
+def read_parquet(path, columns):
+    """Read columns from a Parquet file, with Arrow-backed string columns"""
+    df = pd.read_parquet(path, columns=columns)
+    string_columns = df.select_dtypes(['object', 'string']).columns
+    return df.astype(dict.fromkeys(string_columns, 'string[pyarrow]'))
+
+
+def read_files(read_file, files):
+    """Read (name, path) pairs on a thread pool and return {name: df} for the
+    files that loaded. read_file returns a (df, error) pair and must not call
+    Streamlit, so errors are reported here once every read has finished."""
+    with ThreadPoolExecutor(max_workers=MAX_READ_WORKERS) as executor:
+        results = list(executor.map(read_file, [path for _, path in files]))
+
+    frames = {}
+    for (name, _), (df, error) in zip(files, results, strict=True):
+        if error is not None:
+            st.sidebar.error(error)
+        else:
+            frames[name] = df
+    return frames
+
+
+def read_estate_file(parquet_file):
+    """Read one estate Parquet file and categorise its completion years"""
+    try:
+        df = read_parquet(parquet_file, ESTATE_COLUMNS)
+    except Exception as e:
+        return None, f'Error loading {parquet_file.name}: {str(e)}'
+    df['Completion_Year'] = completion_year_categorical(df['Probable Completion'])
+    return df, None
 
 
 @st.cache_data
-def load_estate_data(base_path='./data/by_estate_mrt'):
-    """Load all estate CSV files from by_estate folder"""
+def load_estate_data(cache_key, base_path='./data/by_estate_mrt'):
+    """Load all estate Parquet files from by_estate_mrt folder"""
+    estates = read_pickle_cache('estates', cache_key)
+    if estates is not None:
+        return estates
+
     estates = {}
     estate_path = Path(base_path)
 
     if estate_path.exists():
-        for csv_file in estate_path.rglob('*.csv'):
-            estate_name = str(csv_file.relative_to(base_path)).replace('.csv', '')
-            try:
-                df = pd.read_csv(csv_file)
-                df.columns = df.columns.str.strip()
-
-                # Convert room counts to numeric
-                room_columns = ['2-room Flexi', '3-room', '3Gen', '4-room', '5-room']
-                for col in room_columns:
-                    if col in df.columns:
-                        df[col] = (
-                            pd.to_numeric(df[col], errors='coerce')
-                            .fillna(0)
-                            .astype(int)
-                        )
+        estate_files = [
+            (
+                str(parquet_file.relative_to(base_path)).replace('.parquet', ''),
+                parquet_file,
+            )
+            for parquet_file in estate_path.rglob('*.parquet')
+        ]
+        estates = read_files(read_estate_file, estate_files)
+        # Only cache a complete load, so the next cold start reads a failed
+        # file again and reports its error instead of silently leaving it out
+        if len(estates) < len(estate_files):
+            return estates
 
-                estates[estate_name] = df
-            except Exception as e:
-                st.sidebar.error(f'Error loading {csv_file.name}: {str(e)}')
+    write_pickle_cache('estates', cache_key, estates)
     return estates
 
 
+def build_project_table(frames, columns, category_columns):
+    """Concatenate per-project frames into one table with a sorted
+    (project_name, flat_type, ethnicity) index"""
+    if not frames:
+        frames = [pd.DataFrame(columns=['project_name', *columns])]
+    table = pd.concat(frames, ignore_index=True)
+    table = table.astype(dict.fromkeys(category_columns, 'category'))
+    return table.set_index(PROJECT_INDEX).sort_index()
+
+
+def select_units(table, project_name, room_type, ethnicity):
+    """Rows of a project table for one project, room type and ethnicity"""
+    key = (project_name, room_type, ethnicity)
+    if key not in table.index:
+        return table.iloc[:0].reset_index(drop=True)
+    return table.loc[[key]].reset_index(drop=True)
+
+
 @st.cache_data
-def load_project_data(base_path='./data/by_project'):
-    """Load all project CSV files from by_project folder"""
-    projects = {}
+def list_projects(cache_key, base_path='./data/by_project'):
+    """Names of the projects with a folder in by_project"""
     project_path = Path(base_path)
+    if not project_path.exists():
+        return set()
+    return {p.name for p in project_path.iterdir() if p.is_dir()}
+
+
+def read_project_file(parquet_file, columns):
+    """Read one project Parquet file"""
+    try:
+        return read_parquet(parquet_file, columns), None
+    except Exception as e:
+        return None, f'Error loading {parquet_file.name}: {str(e)}'
+
+
+def load_project_files(project_names, file_name, columns, base_path, optional=False):
+    """Read one file per project and tag each frame with its project name.
+    Projects without the file are skipped if it is optional."""
+    project_files = [
+        (project_name, Path(base_path) / project_name / file_name)
+        for project_name in project_names
+    ]
+    if optional:
+        project_files = [(name, path) for name, path in project_files if path.exists()]
+    frames = read_files(
+        lambda parquet_file: read_project_file(parquet_file, columns), project_files
+    )
+    return [df.assign(project_name=project_name) for project_name, df in frames.items()]
 
-    if project_path.exists():
-        for project_folder in project_path.iterdir():
-            project_name = project_folder.stem
-            csv_file = project_folder / 'floor_price_detailed.csv'
-            try:
-                df = pd.read_csv(csv_file)
-                df.columns = df.columns.str.strip()
-                projects[project_name] = df
-            except Exception as e:
-                st.sidebar.error(f'Error loading {csv_file.name}: {str(e)}')
-    return projects
+
+@st.cache_data
+def load_project_data(project_names, cache_key, base_path='./data/by_project'):
+    """Load the floor_price_detailed.parquet files of the given projects into
+    one table"""
+    frames = load_project_files(
+        project_names, 'floor_price_detailed.parquet', PROJECT_COLUMNS, base_path
+    )
+    return build_project_table(
+        frames, PROJECT_COLUMNS, ['project_name', 'flat_type', 'ethnicity', 'block']
+    )
 
 
 @st.cache_data
-def load_floor_price_data(base_path='./data/by_project'):
-    """Load floor_price_consolidated.csv files from project folders"""
-    floor_price_data = {}
-    project_path = Path(base_path)
+def load_floor_price_data(project_names, cache_key, base_path='./data/by_project'):
+    """Load the floor_price_consolidated.parquet files of the given projects
+    into one table"""
+    frames = load_project_files(
+        project_names,
+        'floor_price_consolidated.parquet',
+        FLOOR_PRICE_COLUMNS,
+        base_path,
+        optional=True,
+    )
+    return build_project_table(
+        frames, FLOOR_PRICE_COLUMNS, ['project_name', 'flat_type', 'ethnicity']
+    )
+
+
+@st.cache_data
+def build_unit_cube(projects_data):
+    """Total units per project, indexed by project name with one column per
+    (flat_type, ethnicity) pair"""
+    return (
+        parse_floor_series(projects_data['floor_data'])
+        .groupby(level=PROJECT_INDEX, observed=True)['count']
+        .sum()
+        .unstack(['flat_type', 'ethnicity'], fill_value=0)
+    )
+
+
+# Chart builders, cached on the filter selection and the data files' cache
+# key. The underscored frame argument is not hashed, so a cache hit skips
+# both hashing and rebuilding.
+@st.cache_data
+def build_lease_fig(estate, room_type, ethnicity, data_key, _estate_df_filtered):
+    """Bar chart of filtered units by remaining lease"""
+    lease_units = (
+        _estate_df_filtered.groupby('Remaining Lease')['Filtered_Units']
+        .sum()
+        .sort_index()
+    )
+
+    fig_lease = go.Figure(
+        data=[
+            go.Bar(
+                x=lease_units.index.to_numpy(),
+                y=lease_units.to_numpy(),
+                marker_color='#1f77b4',
+                text=lease_units.to_numpy().astype(str),
+                textposition='auto',
+            )
+        ]
+    )
+    fig_lease.update_layout(
+        xaxis_title='Remaining Lease',
+        yaxis_title='Number of Units',
+        height=350,
+        showlegend=False,
+    )
+    return fig_lease
 
-    if project_path.exists():
-        for project_folder in project_path.iterdir():
-            if project_folder.is_dir():
-                consolidated_file = project_folder / 'floor_price_consolidated.csv'
-                if consolidated_file.exists():
-                    try:
-                        df = pd.read_csv(consolidated_file)
-                        df.columns = df.columns.str.strip()
-                        floor_price_data[project_folder.name] = df
-                    except Exception as e:
-                        st.sidebar.error(
-                            f'Error loading {consolidated_file.name}: {str(e)}'
-                        )
 
-    return floor_price_data
+@st.cache_data
+def build_completion_fig(estate, room_type, ethnicity, data_key, _estate_df_filtered):
+    """Bar chart of filtered units by completion year, 'Available Now' first"""
+    # Completion_Year is an ordered category, so groupby already puts
+    # 'Available Now' first
+    completion_units = _estate_df_filtered.groupby('Completion_Year', observed=True)[
+        'Filtered_Units'
+    ].sum()
+    fig_completion = go.Figure(
+        data=[
+            go.Bar(
+                x=completion_units.index.to_numpy(),
+                y=completion_units.to_numpy(),
+                marker_color='#2ecc71',
+                text=completion_units.to_numpy().astype(str),
+                textposition='auto',
+            )
+        ]
+    )
+    fig_completion.update_layout(
+        xaxis_title='Completion Status',
+        yaxis_title='Number of Units',
+        height=350,
+        showlegend=False,
+        xaxis=dict(type='category'),
+    )
+    return fig_completion
+
+
+@st.cache_data
+def build_project_fig(estate, room_type, ethnicity, data_key, _estate_df_filtered):
+    """Bar chart of filtered units by project"""
+    project_units = _estate_df_filtered.set_index('Project Name')[
+        'Filtered_Units'
+    ].sort_values(ascending=True)
+    if len(project_units) > MAX_PROJECT_BARS:
+        others = project_units.iloc[:-MAX_PROJECT_BARS].sum()
+        project_units = pd.concat(
+            [
+                pd.Series({'Others': others}, dtype=project_units.dtype),
+                project_units.tail(MAX_PROJECT_BARS),
+            ]
+        )
+
+    fig_project = go.Figure(
+        data=[
+            go.Bar(
+                x=project_units.index.to_numpy(),
+                y=project_units.to_numpy(),
+                orientation='v',
+                marker_color='#9b59b6',
+                text=project_units.to_numpy().astype(str),
+                textposition='auto',
+            )
+        ]
+    )
+    fig_project.update_layout(
+        yaxis_title='Number of Units',
+        xaxis_title='Project',
+        # height=min(10, int(max(project_units.values))),
+        showlegend=False,
+    )
+    return fig_project
+
+
+# cache_resource hands back the same figure object instead of unpickling a
+# copy of this one-trace-per-project figure on every rerun
+@st.cache_resource
+def build_map_fig(estate, room_type, ethnicity, data_key, _map_df):
+    """Map of project locations sized by filtered units"""
+    # Create map with project names as labels
+    fig = px.scatter_mapbox(
+        _map_df,
+        lat='Latitude',
+        lon='Longitude',
+        text='Project Name',
+        hover_name='Project Name',
+        hover_data={
+            'Remaining Lease': True,
+            'Probable Completion': True,
+            'Filtered_Units': True,
+            'Latitude': False,
+            'Longitude': False,
+            'Project Name': False,
+        },
+        color='Project Name',
+        size='Filtered_Units',
+        size_max=25,
+        zoom=12,
+        height=600,
+        labels={'Filtered_Units': f'{room_type} Units'},
+        color_discrete_sequence=px.colors.qualitative.Set3,
+    )
+
+    fig.update_layout(
+        mapbox_style='open-street-map', margin={'r': 0, 't': 0, 'l': 0, 'b': 0}
+    )
 
+    # Fix: Remove the invalid 'line' property for scattermapbox markers
+    fig.update_traces(textposition='top center', textfont=dict(size=9, color='black'))
+    return fig
 
-# Load all data
-estates_data = load_estate_data()
-projects_data = load_project_data()
-floor_price_data = load_floor_price_data()
+
+@st.cache_data
+def build_floor_fig(project_name, room_type, ethnicity, data_key, _floors):
+    """Bar chart of units per floor across a project's blocks"""
+    floor_units = _floors.groupby('floor')['count'].sum()
+
+    fig_floor = go.Figure(
+        data=[
+            go.Bar(
+                x=floor_units.index.to_numpy(),
+                y=floor_units.to_numpy(),
+                marker_color='#1f77b4',
+                text=floor_units.to_numpy().astype(str),
+                textposition='auto',
+            )
+        ]
+    )
+    fig_floor.update_layout(
+        xaxis_title='Floor',
+        yaxis_title='Number of Units',
+        height=350,
+        showlegend=False,
+        xaxis={'type': 'category'},
+    )
+    return fig_floor
+
+
+# Load estate data, keyed on the data files' mtimes so edits are picked up.
+# Project files are only read once an estate has been selected.
+estate_mtime = data_mtime('./data/by_estate_mrt')
+estates_data = load_estate_data(estate_mtime)
+# The by_project folder's mtime changes when project folders are added or removed
+project_dir = Path('./data/by_project')
+available_projects = list_projects(
+    project_dir.stat().st_mtime if project_dir.exists() else None
+)
 
 # Header
 st.markdown(
@@ -186,42 +520,43 @@ st.sidebar.divider()
 
 # Get filtered estate data
 if selected_estate in estates_data:
-    estate_df = estates_data[selected_estate].copy()
+    # st.cache_data hands every run its own copy, so no defensive copy here
+    estate_df = estates_data[selected_estate]
+
+    # Load the project data for this estate only
+    project_names = tuple(sorted(available_projects & set(estate_df['Project Name'])))
+    project_mtime = data_mtime(
+        *(Path('./data/by_project', name) for name in project_names)
+    )
+    projects_data = load_project_data(project_names, project_mtime)
+    floor_price_data = load_floor_price_data(project_names, project_mtime)
+    # The charts are rebuilt whenever any file they are drawn from changes
+    data_key = (estate_mtime, project_mtime)
+    unit_cube = build_unit_cube(projects_data)
 
     # Filter projects that have the selected room type
     if selected_room_type in estate_df.columns:
-        estate_df_filtered = estate_df[estate_df[selected_room_type] > 0].copy()
-
-        # Calculate filtered units from project data
-        def get_filtered_unit_count(project_name, room_type, ethnicity):
-            """Get unit count for a project filtered by room type and ethnicity"""
-            if project_name not in projects_data:
-                return 0
-
-            project_df = projects_data[project_name]
-            filtered = project_df[
-                (project_df['flat_type'] == room_type)
-                & (project_df['ethnicity'] == ethnicity)
-            ]
-
-            total = 0
-            for floor_data in filtered['floor_data']:
-                total += get_total_units_from_floor_data(floor_data)
+        # Look up filtered unit counts from the precomputed cube
+        unit_key = (selected_room_type, selected_ethnicity)
+        if unit_key in unit_cube.columns:
+            project_units = unit_cube[unit_key]
+        else:
+            project_units = pd.Series(dtype='int32')
+        filtered_units = (
+            estate_df['Project Name'].map(project_units).fillna(0).astype('int32')
+        )
 
-            return total
+        # Keep projects with the selected room type and at least one filtered unit
+        mask = (estate_df[selected_room_type] > 0) & (filtered_units > 0)
 
-        # Add filtered unit counts
-        estate_df_filtered['Filtered_Units'] = estate_df_filtered['Project Name'].apply(
-            lambda x: get_filtered_unit_count(x, selected_room_type, selected_ethnicity)
+        # Attach the unit counts with one concat so the estate rows are only
+        # copied once
+        estate_df_filtered = pd.concat(
+            [estate_df[mask], filtered_units[mask].rename('Filtered_Units')], axis=1
         )
-
-        # Remove projects with 0 filtered units
-        estate_df_filtered = estate_df_filtered[
-            estate_df_filtered['Filtered_Units'] > 0
-        ]
     else:
         estate_df_filtered = pd.DataFrame(
-            columns=estate_df.columns.tolist() + ['Filtered_Units']
+            columns=[*estate_df.columns, 'Filtered_Units']
         )
 
 else:
@@ -261,180 +596,53 @@ with tab1:
         # Remaining Lease Distribution (by units)
         st.subheader('Distribution by Remaining Lease')
 
-        lease_units = (
-            estate_df_filtered.groupby('Remaining Lease')['Filtered_Units']
-            .sum()
-            .sort_index()
+        fig_lease = build_lease_fig(
+            selected_estate,
+            selected_room_type,
+            selected_ethnicity,
+            data_key,
+            estate_df_filtered,
         )
-
-        fig_lease = go.Figure(
-            data=[
-                go.Bar(
-                    x=lease_units.index,
-                    y=lease_units.values,
-                    marker_color='#1f77b4',
-                    text=lease_units.values,
-                    textposition='auto',
-                )
-            ]
-        )
-        fig_lease.update_layout(
-            xaxis_title='Remaining Lease',
-            yaxis_title='Number of Units',
-            height=350,
-            showlegend=False,
-        )
-        st.plotly_chart(fig_lease, use_container_width=True)
+        st.plotly_chart(fig_lease, use_container_width=True, key='lease_chart')
 
     with col2:
         # Completion Status Distribution (by units, bar chart with year or 'Available Now')
         st.subheader('Distribution by Completion Status')
 
-        # Categorize completion dates
-        def categorize_completion(completion):
-            if pd.isna(completion) or completion == '':
-                return 'Unknown'
-            elif 'Keys available' in str(completion) or 'Completed' in str(completion):
-                return 'Available Now'
-            else:
-                # Extract year from completion date
-                try:
-                    # Try to extract year from various formats
-                    import re
-
-                    year_match = re.search(r'20\d{2}', str(completion))
-                    if year_match:
-                        return year_match.group(0)
-                    return str(completion)
-                except:
-                    return str(completion)
-
-        estate_df_filtered['Completion_Year'] = estate_df_filtered[
-            'Probable Completion'
-        ].apply(categorize_completion)
-        completion_units = (
-            estate_df_filtered.groupby('Completion_Year')['Filtered_Units']
-            .sum()
-            .sort_index()
-        )
-
-        # Sort so 'Available Now' comes first if it exists
-        if 'Available Now' in completion_units.index:
-            available_now = completion_units['Available Now']
-            completion_units = completion_units.drop('Available Now')
-            completion_units = pd.concat(
-                [pd.Series({'Available Now': available_now}), completion_units]
-            )
-        fig_completion = go.Figure(
-            data=[
-                go.Bar(
-                    x=completion_units.index,
-                    y=completion_units.values,
-                    marker_color='#2ecc71',
-                    text=completion_units.values,
-                    textposition='auto',
-                )
-            ]
+        fig_completion = build_completion_fig(
+            selected_estate,
+            selected_room_type,
+            selected_ethnicity,
+            data_key,
+            estate_df_filtered,
         )
-        fig_completion.update_layout(
-            xaxis_title='Completion Status',
-            yaxis_title='Number of Units',
-            height=350,
-            showlegend=False,
-            xaxis=dict(type='category'),
+        st.plotly_chart(
+            fig_completion, use_container_width=True, key='completion_chart'
         )
-        st.plotly_chart(fig_completion, use_container_width=True)
 
     # Project Distribution (by units)
     st.subheader('Distribution by Project')
 
-    project_units = estate_df_filtered.set_index('Project Name')[
-        'Filtered_Units'
-    ].sort_values(ascending=True)
-
-    fig_project = go.Figure(
-        data=[
-            go.Bar(
-                x=project_units.index,
-                y=project_units.values,
-                orientation='v',
-                marker_color='#9b59b6',
-                text=project_units.values,
-                textposition='auto',
-            )
-        ]
+    fig_project = build_project_fig(
+        selected_estate,
+        selected_room_type,
+        selected_ethnicity,
+        data_key,
+        estate_df_filtered,
     )
-    fig_project.update_layout(
-        yaxis_title='Number of Units',
-        xaxis_title='Project',
-        # height=min(10, int(max(project_units.values))),
-        showlegend=False,
-    )
-    st.plotly_chart(fig_project, use_container_width=True)
+    st.plotly_chart(fig_project, use_container_width=True, key='project_chart')
 
 with tab2:
     st.subheader('Project Locations Map')
 
-    # Categorize completion for map coloring
-    def categorize_completion_map(completion):
-        if pd.isna(completion) or completion == '':
-            return 'Unknown'
-        elif 'Keys available' in str(completion) or 'Completed' in str(completion):
-            return 'Available Now'
-        else:
-            # Extract year from completion date
-            try:
-                import re
-
-                year_match = re.search(r'20\d{2}', str(completion))
-                if year_match:
-                    return year_match.group(0)
-                return str(completion)
-            except:
-                return str(completion)
-
-    estate_df_filtered['Completion_Category'] = estate_df_filtered[
-        'Probable Completion'
-    ].apply(categorize_completion_map)
-
     # Filter projects with valid coordinates
-    map_df = estate_df_filtered.dropna(subset=['Latitude', 'Longitude']).copy()
+    map_df = estate_df_filtered.dropna(subset=['Latitude', 'Longitude'])
 
     if len(map_df) > 0:
-        # Create map with project names as labels
-        fig = px.scatter_mapbox(
-            map_df,
-            lat='Latitude',
-            lon='Longitude',
-            text='Project Name',
-            hover_name='Project Name',
-            hover_data={
-                'Remaining Lease': True,
-                'Probable Completion': True,
-                'Filtered_Units': True,
-                'Latitude': False,
-                'Longitude': False,
-                'Project Name': False,
-            },
-            color='Project Name',
-            size='Filtered_Units',
-            size_max=25,
-            zoom=12,
-            height=600,
-            labels={'Filtered_Units': f'{selected_room_type} Units'},
-            color_discrete_sequence=px.colors.qualitative.Set3,
-        )
-
-        fig.update_layout(
-            mapbox_style='open-street-map', margin={'r': 0, 't': 0, 'l': 0, 'b': 0}
-        )
-
-        # Fix: Remove the invalid 'line' property for scattermapbox markers
-        fig.update_traces(
-            textposition='top center', textfont=dict(size=9, color='black')
+        fig = build_map_fig(
+            selected_estate, selected_room_type, selected_ethnicity, data_key, map_df
         )
-
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, use_container_width=True, key='map_chart')
 
         st.info(
             f'📍 Showing {len(map_df)} projects. Marker size represents available {selected_room_type} units for {selected_ethnicity} quota.'
@@ -450,7 +658,9 @@ with tab3:
 
     if search:
         display_df = estate_df_filtered[
-            estate_df_filtered['Project Name'].str.contains(search, case=False)
+            estate_df_filtered['Project Name'].str.contains(
+                search, case=False, regex=False
+            )
         ]
     else:
         display_df = estate_df_filtered
@@ -463,150 +673,174 @@ with tab3:
     # Calculate total units for percentage calculation
     total_units_in_estate = display_df['Filtered_Units'].sum()
 
-    # Display each project as an expandable card
-    for idx, row in display_df.iterrows():
-        # Calculate percentage of total units
-        unit_percentage = row['Filtered_Units'] / total_filtered_units * 100
-
-        with st.expander(
-            f'**{row["Project Name"]}** - {int(row["Filtered_Units"])} units ({unit_percentage:.1f}% of total)',
-            expanded=False,
-        ):
-            col1, col2 = st.columns([2, 1])
-
-            with col1:
-                st.markdown(f'### {row["Project Name"]}')
-                st.markdown(f'**📍 Town:** {row["Town"]}')
-                st.markdown(f'**⏰ Remaining Lease:** {row["Remaining Lease"]}')
-                st.markdown(f'**📅 Probable Completion:** {row["Probable Completion"]}')
-
-                # MRT and walking information
-                if 'Nearest_MRT' in row and pd.notna(row['Nearest_MRT']):
+    # Percentage of total units, computed for the whole listing at once
+    listing_df = display_df.assign(
+        unit_percentage=display_df['Filtered_Units'] / total_filtered_units * 100
+    )
+    listing_columns = [
+        'Project Name',
+        'Filtered_Units',
+        'unit_percentage',
+        'Remaining Lease',
+        'Probable Completion',
+        'Nearest_MRT',
+        'Walk_Distance_m',
+        'bus_duration_min',
+        'URL',
+    ]
+    st.dataframe(
+        listing_df[listing_columns],
+        use_container_width=True,
+        hide_index=True,
+        height=600,
+        column_config={
+            'Filtered_Units': st.column_config.NumberColumn(
+                f'{selected_room_type} Units'
+            ),
+            'unit_percentage': st.column_config.NumberColumn(
+                '% of Total', format='%.1f%%'
+            ),
+            'Nearest_MRT': 'Nearest MRT',
+            'Walk_Distance_m': st.column_config.NumberColumn(
+                'Walk to MRT (m)', format='%.0f'
+            ),
+            'bus_duration_min': st.column_config.NumberColumn(
+                'Bus to MRT (min)', format='%.0f'
+            ),
+            'URL': st.column_config.LinkColumn('HDB Website'),
+        },
+    )
+
+    # Details for a single project
+    if not listing_df.empty:
+        selected_project = st.selectbox(
+            'Project details', options=listing_df['Project Name']
+        )
+        row = listing_df[listing_df['Project Name'] == selected_project].iloc[0]
+        unit_percentage = row['unit_percentage']
+
+        col1, col2 = st.columns([2, 1])
+
+        with col1:
+            st.markdown(f'### {row["Project Name"]}')
+            st.markdown(f'**📍 Town:** {row["Town"]}')
+            st.markdown(f'**⏰ Remaining Lease:** {row["Remaining Lease"]}')
+            st.markdown(f'**📅 Probable Completion:** {row["Probable Completion"]}')
+
+            # MRT and walking information
+            if 'Nearest_MRT' in row and pd.notna(row['Nearest_MRT']):
+                st.markdown(
+                    f'**🚇 Nearest MRT Station:** {row["Nearest_MRT"]} ({row.get("MRT_Station_Code", "N/A")})'
+                )
+                if 'bus_duration_min' in row and pd.notna(row['bus_duration_min']):
                     st.markdown(
-                        f'**🚇 Nearest MRT Station:** {row["Nearest_MRT"]} ({row.get("MRT_Station_Code", "N/A")})'
+                        f'**⏱️ Bus Duration to Nearest MRT:** {row["bus_duration_min"]:.0f} min'
                     )
-                    if 'bus_duration_min' in row and pd.notna(row['bus_duration_min']):
-                        st.markdown(
-                            f'**⏱️ Bus Duration to Nearest MRT:** {row["bus_duration_min"]:.0f} min'
-                        )
-                    # if 'MRT_Distance_m' in row and pd.notna(row['MRT_Distance_m']):
-                    #     st.markdown(f"**📏 MRT Distance:** {row['MRT_Distance_m']:.0f}m")
-                    if 'Walk_Distance_m' in row and pd.notna(row['Walk_Distance_m']):
-                        st.markdown(
-                            f'**🚶 Walking Distance to Nearest MRT:** {row["Walk_Distance_m"]:.0f}m (~{row.get("Walk_Duration_min", 0):.0f} min)'
-                        )
-
-                # All room types available
-                st.markdown('**Available Room Types:**')
-                room_types_avail = []
-                for room_col in ['2-room Flexi', '3-room', '3Gen', '4-room', '5-room']:
-                    if room_col in row and row[room_col] > 0:
-                        room_types_avail.append(f'{room_col}: {int(row[room_col])}')
-                st.markdown('• ' + '  \n• '.join(room_types_avail))
-
-            with col2:
-                st.markdown(f'### Current Filter')
-                st.markdown(f'**Room Type:** {selected_room_type}')
-                st.markdown(f'**Ethnicity:** {selected_ethnicity}')
-                st.markdown(f'**Available Units:** {int(row["Filtered_Units"])}')
-                st.markdown(f'**% of Total:** {unit_percentage:.1f}%')
-
-                if 'URL' in row and pd.notna(row['URL']):
-                    st.link_button(
-                        'View on HDB Website', row['URL'], use_container_width=True
+                # if 'MRT_Distance_m' in row and pd.notna(row['MRT_Distance_m']):
+                #     st.markdown(f"**📏 MRT Distance:** {row['MRT_Distance_m']:.0f}m")
+                if 'Walk_Distance_m' in row and pd.notna(row['Walk_Distance_m']):
+                    st.markdown(
+                        f'**🚶 Walking Distance to Nearest MRT:** {row["Walk_Distance_m"]:.0f}m (~{row.get("Walk_Duration_min", 0):.0f} min)'
                     )
 
-            # Use floor_price_consolidated.csv if available
-            if row['Project Name'] in floor_price_data:
-                st.divider()
-                st.markdown('#### Floor and Price Range Details')
-
-                floor_price_df = floor_price_data[row['Project Name']]
-
-                # Filter by room type and ethnicity
-                filtered_floor_price = floor_price_df[
-                    (floor_price_df['flat_type'] == selected_room_type)
-                    & (floor_price_df['ethnicity'] == selected_ethnicity)
-                ]
-
-                if not filtered_floor_price.empty:
-                    for _, fp_row in filtered_floor_price.iterrows():
-                        price_range = fp_row['price_range']
-                        if isinstance(fp_row['price_range'], float):
-                            price_range = 'N/A'
-                        st.markdown(f'**Blocks:** {fp_row["blocks"]}')
-                        st.markdown(f'**Total Units:** {fp_row["total_units"]}')
-                        st.markdown(
-                            f'**Price Range:** {price_range.replace("$", "\$")}'
-                        )
+            # All room types available
+            st.markdown('**Available Room Types:**')
+            room_types_avail = []
+            for room_col in ['2-room Flexi', '3-room', '3Gen', '4-room', '5-room']:
+                if room_col in row and row[room_col] > 0:
+                    room_types_avail.append(f'{room_col}: {int(row[room_col])}')
+            st.markdown('• ' + '  \n• '.join(room_types_avail))
+
+        with col2:
+            st.markdown(f'### Current Filter')
+            st.markdown(f'**Room Type:** {selected_room_type}')
+            st.markdown(f'**Ethnicity:** {selected_ethnicity}')
+            st.markdown(f'**Available Units:** {int(row["Filtered_Units"])}')
+            st.markdown(f'**% of Total:** {unit_percentage:.1f}%')
+
+            if 'URL' in row and pd.notna(row['URL']):
+                st.link_button(
+                    'View on HDB Website', row['URL'], use_container_width=True
+                )
 
-                        # Parse and display floor summary
-                        floors = parse_floor_data(fp_row['floor_summary'])
-                        if floors:
-                            st.markdown('**Floor Distribution:**')
-                            floor_table = pd.DataFrame(floors)
-                            floor_table.columns = ['Floor', 'Units']
-                            st.dataframe(
-                                floor_table, use_container_width=True, hide_index=True
-                            )
-                            # fig_floor = go.Figure(data=[
-                            #     go.Bar(
-                            #         x=floor_table['Floor'],
-                            #         y=floor_table['Units'],
-                            #         marker_color='#1f77b4',
-                            #         text=floor_table['Units'],
-                            #         textposition='auto',
-                            #     )
-                            # ])
-                            # fig_floor.update_layout(
-                            #     xaxis_title="Floor",
-                            #     yaxis_title="Number of Units",
-                            #     # height=350,
-                            #     showlegend=False,
-                            #     xaxis=dict(
-                            #         tickmode='array', # Set tick mode to 'array' to use custom values/text
-                            #         tickvals=floor_table['Floor'], # Specify which values should have ticks
-                            #         # ticktext=custom_labels # Specify the labels for those ticks
-                            #     )
-                            # )
-                            # st.plotly_chart(fig_floor, use_container_width=True)
-                else:
-                    st.info(
-                        f'No floor/price data available for {selected_room_type} units with {selected_ethnicity} quota.'
-                    )
+        # Use floor_price_consolidated.csv if available
+        if row['Project Name'] in floor_price_data.index:
+            st.divider()
+            st.markdown('#### Floor and Price Range Details')
+
+            filtered_floor_price = select_units(
+                floor_price_data,
+                row['Project Name'],
+                selected_room_type,
+                selected_ethnicity,
+            )
 
-            # Fallback to old project data if floor_price_consolidated doesn't exist
-            elif row['Project Name'] in projects_data:
-                st.divider()
-                st.markdown('#### Detailed Unit Breakdown')
-
-                project_df = projects_data[row['Project Name']]
-                filtered_project = project_df[
-                    (project_df['flat_type'] == selected_room_type)
-                    & (project_df['ethnicity'] == selected_ethnicity)
-                ]
-
-                if not filtered_project.empty:
-                    # Parse and display floor information
-                    floor_breakdown = []
-                    for _, prow in filtered_project.iterrows():
-                        floors = parse_floor_data(prow['floor_data'])
-                        for floor in floors:
-                            floor_breakdown.append(
-                                {
-                                    'Block': prow['block'],
-                                    'Floor': floor['floor'],
-                                    'Units': floor['count'],
-                                    'Price Range': prow['price_range'],
-                                }
-                            )
-
-                    if floor_breakdown:
-                        floor_df_display = pd.DataFrame(floor_breakdown)
+            if not filtered_floor_price.empty:
+                floors = parse_floor_series(filtered_floor_price['floor_summary'])
+                for fp_idx, fp_row in filtered_floor_price.iterrows():
+                    price_range = fp_row['price_range']
+                    if pd.isna(price_range):
+                        price_range = 'N/A'
+                    st.markdown(f'**Blocks:** {fp_row["blocks"]}')
+                    st.markdown(f'**Total Units:** {fp_row["total_units"]}')
+                    st.markdown(f'**Price Range:** {price_range.replace("$", "\$")}')
+
+                    # Display the floors parsed for this row
+                    if fp_idx in floors.index:
+                        st.markdown('**Floor Distribution:**')
+                        floor_table = floors.loc[fp_idx]
+                        floor_table.columns = ['Floor', 'Units']
                         st.dataframe(
-                            floor_df_display, use_container_width=True, hide_index=True
+                            floor_table, use_container_width=True, hide_index=True
                         )
 
+                # One chart for the selected project, updated in place when
+                # the selection changes
+                if not floors.empty:
+                    st.plotly_chart(
+                        build_floor_fig(
+                            row['Project Name'],
+                            selected_room_type,
+                            selected_ethnicity,
+                            data_key,
+                            floors,
+                        ),
+                        use_container_width=True,
+                        key='floor_dist',
+                    )
+            else:
+                st.info(
+                    f'No floor/price data available for {selected_room_type} units with {selected_ethnicity} quota.'
+                )
+
+        # Fallback to old project data if floor_price_consolidated doesn't exist
+        elif row['Project Name'] in projects_data.index:
+            st.divider()
+            st.markdown('#### Detailed Unit Breakdown')
+
+            filtered_project = select_units(
+                projects_data,
+                row['Project Name'],
+                selected_room_type,
+                selected_ethnicity,
+            )
+
+            if not filtered_project.empty:
+                # Parse and display floor information
+                floor_breakdown = (
+                    parse_floor_series(filtered_project['floor_data'])
+                    .droplevel('match')
+                    .join(filtered_project[['block', 'price_range']])
+                )
+
+                if not floor_breakdown.empty:
+                    floor_df_display = floor_breakdown[
+                        ['block', 'floor', 'count', 'price_range']
+                    ].set_axis(['Block', 'Floor', 'Units', 'Price Range'], axis=1)
+                    st.dataframe(
+                        floor_df_display, use_container_width=True, hide_index=True
+                    )
+
 # Footer
 st.divider()
 st.markdown(
@@ -5,13 +5,74 @@ and calculate walking and public transport distances and durations.
 Uses Singapore OneMap API for routing and MRT station data.
 """
 
-import time
-from math import asin, cos, radians, sin, sqrt
+import json
+import logging
+import os
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Estate CSV columns read with a fixed dtype. float32 keeps coordinates to
+# within half a metre, the same precision the app stores them at.
+ESTATE_DTYPES = {
+    'Latitude': 'float32',
+    'Longitude': 'float32',
+    'Project Name': 'string',
+    'Town': 'category',
+}
+
+# OneMap endpoints
+NEARBY_URL = 'https://www.onemap.gov.sg/api/public/nearbysvc/getNearestMrtStops'
+ROUTE_URL = 'https://www.onemap.gov.sg/api/public/routingsvc/route'
+# Public transport routes are planned for the same weekday midday trip by bus
+PT_ROUTE_PARAMS = {
+    'routeType': 'pt',
+    'numItineraries': 1,
+    'date': '02-02-2026',
+    'time': '12:00:00',
+    'mode': 'BUS',
+}
+WALK_ROUTE_PARAMS = {'routeType': 'walk', 'numItineraries': 1}
+# (connect, read) timeouts in seconds; a stuck request is retried by the
+# session's Retry policy instead of holding a worker for long
+REQUEST_TIMEOUT = (3, 5)
+
+# Rows processed at once across all estate files; each row makes its own
+# OneMap requests
+MAX_WORKERS = 8
+# Progress is logged every this many rows of a file
+PROGRESS_EVERY = 50
+# Estate files processed at once. They share the row workers above, so this
+# only keeps the row pool busy while another file is loading or saving.
+MAX_FILE_WORKERS = 4
+
+# Stations within this distance count as nearby, as in OneMap's search radius
+MRT_SEARCH_RADIUS_M = 2000
+# Local snapshot of every MRT station, seeded from OneMap on first use
+MRT_STATIONS_FILE = Path('data/mrt_stations.json')
+# Walking estimate used instead of the routing API: walks to an MRT station
+# are about 1.3x the straight-line distance, at 80m/min (about 4.8km/h)
+WALK_DETOUR_FACTOR = 1.3
+WALK_SPEED_M_PER_MIN = 80
+# Routes already fetched, reused within and across runs
+ROUTE_CACHE_FILE = Path('.cache/routing_cache.json')
+# Route origins are snapped to 4 decimal places (about 10m) for the cache key
+ROUTE_CACHE_PRECISION = 4
+# Grid of points queried to seed the snapshot. 0.02 degrees is about 2.2km,
+# so each search radius overlaps its neighbours and no station is missed.
+SINGAPORE_GRID = {
+    'latitudes': np.arange(1.22, 1.48, 0.02),
+    'longitudes': np.arange(103.60, 104.10, 0.02),
+}
 
 
 def get_onemap_token() -> str:
@@ -20,69 +81,159 @@ def get_onemap_token() -> str:
     return token[0]
 
 
-def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+def create_session() -> requests.Session:
     """
-    Calculate the great circle distance between two points on earth (in meters).
+    Create a session whose pooled connections are shared by all requests,
+    with retries and backoff on timeouts, rate limiting and server errors.
     """
-    # Convert decimal degrees to radians
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+    retry = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['GET'],
+    )
+    # Up to two requests per row worker are in flight when walking routes are
+    # fetched too, so the pool holds 2 * MAX_WORKERS connections
+    adapter = HTTPAdapter(
+        pool_connections=16, pool_maxsize=2 * MAX_WORKERS, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    return session
+
+
+def warm_up_session(session: requests.Session, nearby_headers: dict):
+    """
+    Make one small request so the connection to OneMap, including the TLS
+    handshake, is already open when the first row is processed.
+    """
+    params = {'latitude': 1.35, 'longitude': 103.8, 'radius_in_meters': 100}
+    try:
+        session.get(
+            NEARBY_URL, params=params, headers=nearby_headers, timeout=REQUEST_TIMEOUT
+        )
+    except requests.RequestException as e:
+        logger.warning('Could not warm up OneMap connection: %s', e)
+
 
+def haversine_radians(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Calculate the great circle distances between points on earth (in meters),
+    for coordinates already in radians.
+    Arguments may be scalars or NumPy arrays and are broadcast against each
+    other, so one call can measure a location against every MRT station.
+    """
     # Haversine formula
     dlon = lon2 - lon1
     dlat = lat2 - lat1
-    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-    c = 2 * asin(sqrt(a))
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arcsin(np.sqrt(a))
 
     # Radius of earth in meters
     r = 6371000
     return c * r
 
 
-def get_nearest_mrt(lat: float, lon: float, token: str) -> Optional[dict]:
+def get_nearby_mrt_stops(
+    lat: float, lon: float, headers: dict, session: requests.Session
+) -> list[dict]:
     """
-    Find the nearest MRT station using OneMap's Nearby Transport API.
-    Returns information about the nearest MRT station.
+    Find the MRT stations near a point using OneMap's Nearby Transport API.
     """
-    # OneMap Nearby Transport API endpoint
-    nearby_url = 'https://www.onemap.gov.sg/api/public/nearbysvc/getNearestMrtStops'
-
     params = {
         'latitude': lat,
         'longitude': lon,
-        'radius_in_meters': 2000,  # Search radius in meters
+        'radius_in_meters': MRT_SEARCH_RADIUS_M,  # Search radius in meters
     }
 
-    headers = {}
-    if token:
-        headers['Authorization'] = f'Bearer {token}'
+    response = session.get(
+        NEARBY_URL, params=params, headers=headers, timeout=REQUEST_TIMEOUT
+    )
+    response.raise_for_status()
+    return json.loads(response.content)
 
-    try:
-        response = requests.get(nearby_url, params=params, headers=headers, timeout=10)
-        if response.status_code == 200:
-            mrt_stations = response.json()
-
-            if mrt_stations:
-                # The API returns stations sorted by distance
-                nearest = mrt_stations[0]
-
-                # Calculate actual distance
-                station_lat = float(nearest.get('lat', 0))
-                station_lon = float(nearest.get('lon', 0))
-
-                return {
-                    'name': nearest.get('name', 'Unknown MRT'),
-                    'latitude': station_lat,
-                    'longitude': station_lon,
-                    'distance_meters': haversine_distance(
-                        lat, lon, station_lat, station_lon
-                    ),
-                    'code': nearest.get('id', ''),
-                    'type': nearest.get('type', 'MRT'),
-                }
-    except Exception as e:
-        print(f'Error getting nearest MRT: {e}')
 
-    return None
+def load_mrt_stations(nearby_headers: dict, session: requests.Session) -> dict:
+    """
+    Load the MRT station list from MRT_STATIONS_FILE. If there is no snapshot
+    yet, seed it once by querying OneMap over a grid covering Singapore.
+    """
+    if MRT_STATIONS_FILE.exists():
+        with open(MRT_STATIONS_FILE) as file:
+            return index_mrt_stations(json.load(file))
+
+    logger.info('Seeding MRT station list from OneMap...')
+    grid = [
+        (lat, lon)
+        for lat in SINGAPORE_GRID['latitudes']
+        for lon in SINGAPORE_GRID['longitudes']
+    ]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        responses = executor.map(
+            lambda point: get_nearby_mrt_stops(*point, nearby_headers, session), grid
+        )
+
+    stations = {}
+    for stops in responses:
+        for stop in stops:
+            stations[(stop.get('name'), stop.get('id'))] = {
+                'name': stop.get('name', 'Unknown MRT'),
+                'code': stop.get('id', ''),
+                'type': stop.get('type', 'MRT'),
+                'latitude': float(stop.get('lat', 0)),
+                'longitude': float(stop.get('lon', 0)),
+            }
+
+    records = sorted(stations.values(), key=lambda station: station['code'])
+    MRT_STATIONS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(MRT_STATIONS_FILE, 'w') as file:
+        json.dump(records, file, indent=2)
+    logger.info('Saved %d MRT stations to %s', len(records), MRT_STATIONS_FILE)
+    return index_mrt_stations(records)
+
+
+def index_mrt_stations(records: list[dict]) -> dict:
+    """
+    Prepare the station records for nearest-station lookups: coordinates as
+    NumPy arrays already in radians, next to the records they index. This is
+    done once so each lookup is only array arithmetic and a list index.
+    """
+    return {
+        'records': records,
+        'lat_rad': np.radians([station['latitude'] for station in records]),
+        'lon_rad': np.radians([station['longitude'] for station in records]),
+    }
+
+
+def get_nearest_mrt(lat: float, lon: float, stations: dict) -> Optional[dict]:
+    """
+    Find the nearest MRT station from the local station list.
+    Returns information about the nearest MRT station, or None if there is
+    none within the search radius.
+    """
+    distances = haversine_radians(
+        np.radians(lat),
+        np.radians(lon),
+        stations['lat_rad'],
+        stations['lon_rad'],
+    )
+    # Locations without coordinates have NaN distances to every station
+    if np.isnan(distances).all():
+        return None
+
+    idx = np.nanargmin(distances)
+    if distances[idx] > MRT_SEARCH_RADIUS_M:
+        return None
+
+    nearest = stations['records'][idx]
+    return {
+        'name': nearest['name'],
+        'latitude': nearest['latitude'],
+        'longitude': nearest['longitude'],
+        'distance_meters': float(distances[idx]),
+        'code': nearest['code'],
+        'type': nearest['type'],
+    }
 
 
 def get_route_info_walk(
@@ -90,36 +241,33 @@ def get_route_info_walk(
     start_lon: float,
     end_lat: float,
     end_lon: float,
-    token: str = None,
+    *,
+    session: requests.Session,
+    headers: dict,
 ) -> dict:
     """
     Get routing information from OneMap API.
     """
-    url = 'https://www.onemap.gov.sg/api/public/routingsvc/route'
     params = {
         'start': f'{start_lat},{start_lon}',
         'end': f'{end_lat},{end_lon}',
-        'routeType': 'walk',
-        'numItineraries': 1,
+        **WALK_ROUTE_PARAMS,
     }
 
-    headers = {'Authorization': token}
-
-    try:
-        print('params', params)
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-
-            # Extract route information
-            route_summary = data.get('route_summary', {})
-            return {
-                'distance_meters': route_summary.get('total_distance', 0),
-                'duration_seconds': route_summary.get('total_time', 0),
-                'duration_minutes': round(route_summary.get('total_time', 0) / 60, 1),
-            }
-    except Exception as e:
-        print(f'Error getting route info ({route_type}): {e}')
+    logger.debug('Walking route params: %s', params)
+    response = session.get(
+        ROUTE_URL, params=params, headers=headers, timeout=REQUEST_TIMEOUT
+    )
+    response.raise_for_status()
+    data = json.loads(response.content)
+
+    # Extract route information
+    route_summary = data.get('route_summary', {})
+    return {
+        'distance_meters': route_summary.get('total_distance', 0),
+        'duration_seconds': route_summary.get('total_time', 0),
+        'duration_minutes': round(route_summary.get('total_time', 0) / 60, 1),
+    }
 
 
 def get_route_info_pt(
@@ -127,141 +275,363 @@ def get_route_info_pt(
     start_lon: float,
     end_lat: float,
     end_lon: float,
-    token: str = None,
+    *,
+    session: requests.Session,
+    headers: dict,
 ) -> dict:
     """
     Get routing information from OneMap API.
     """
-    url = 'https://www.onemap.gov.sg/api/public/routingsvc/route'
     params = {
         'start': f'{start_lat},{start_lon}',
         'end': f'{end_lat},{end_lon}',
-        'routeType': 'pt',
-        'numItineraries': 1,
-        'date': '02-02-2026',
-        'time': '12:00:00',
-        'mode': 'BUS',
+        **PT_ROUTE_PARAMS,
     }
 
-    headers = {'Authorization': token}
-
-    try:
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-
-            # Extract route information
-            itinerary = data['plan']['itineraries'][0]
-            return {
-                'duration_seconds': itinerary.get('duration', 0),
-                'duration_minutes': round(itinerary.get('duration', 0) / 60, 1),
-            }
-    except Exception as e:
-        print(f'Error getting route info ({route_type}): {e}')
+    response = session.get(
+        ROUTE_URL, params=params, headers=headers, timeout=REQUEST_TIMEOUT
+    )
+    response.raise_for_status()
+    data = json.loads(response.content)
+
+    # Extract route information
+    itinerary = data['plan']['itineraries'][0]
+    return {
+        'duration_seconds': itinerary.get('duration', 0),
+        'duration_minutes': round(itinerary.get('duration', 0) / 60, 1),
+    }
 
 
-def process_csv(input_file: str, output_file: str):
+def load_route_cache() -> dict:
     """
-    Process the CSV file and add nearest MRT station information.
+    Load the routes fetched by earlier runs from ROUTE_CACHE_FILE.
     """
-    print('Loading CSV file...')
-    df = pd.read_csv(input_file)
+    if not ROUTE_CACHE_FILE.exists():
+        return {}
+    with open(ROUTE_CACHE_FILE) as file:
+        return json.load(file)
 
-    # Get OneMap token (optional, for better routing)
-    token = get_onemap_token()
 
-    # Initialize new columns
-    df['Nearest_MRT'] = ''
-    df['MRT_Station_Code'] = ''
-    df['MRT_Distance_m'] = 0.0
-    df['Walk_Distance_m'] = 0.0
-    df['Walk_Duration_min'] = 0.0
-    df['bus_duration_min'] = 0.0
+def save_route_cache(route_cache: dict):
+    """
+    Write the route cache to ROUTE_CACHE_FILE, replacing it atomically.
+    """
+    ROUTE_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = ROUTE_CACHE_FILE.with_suffix('.tmp')
+    with open(tmp_file, 'w') as file:
+        json.dump(route_cache, file)
+    os.replace(tmp_file, ROUTE_CACHE_FILE)
+
+
+def get_cached_route(
+    route_type: str,
+    lat: float,
+    lon: float,
+    mrt_code: str,
+    *,
+    route_cache: dict,
+    fetch_route: Callable[[], dict],
+) -> dict:
+    """
+    Return the cached route from a location to an MRT station, calling
+    fetch_route only on a miss. Nearby locations share an entry because the
+    origin is snapped to a ~10m grid.
+    """
+    key = (
+        f'{route_type}:{round(lat, ROUTE_CACHE_PRECISION)},'
+        f'{round(lon, ROUTE_CACHE_PRECISION)}:{mrt_code}'
+    )
+    if key in route_cache:
+        return route_cache[key]
 
-    print('\nProcessing each location...')
-    for idx, row in df.iterrows():
-        lat = row['Latitude']
-        lon = row['Longitude']
-        project_name = row['Project Name']
+    # A failed lookup raises, so only successful routes are cached
+    route = fetch_route()
+    route_cache[key] = route
+    return route
 
-        print(f'\nProcessing {idx + 1}/{len(df)}: {project_name}')
 
-        # Find nearest MRT using Nearby Transport API
-        nearest_mrt = get_nearest_mrt(lat, lon, token)
+def load_partial_results(partial_file: Path) -> dict:
+    """
+    Load the rows finished by an earlier, interrupted run from its partial
+    results file, keyed by (latitude, longitude, project name).
+    """
+    if not partial_file.exists():
+        return {}
+
+    done = {}
+    with open(partial_file) as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line may be cut short if the run died mid-write
+                continue
+            done[tuple(record['key'])] = record['result']
+    return done
+
+
+def process_row(
+    lat: float,
+    lon: float,
+    project_name: str,
+    route_headers: dict,
+    *,
+    session: requests.Session,
+    stations: dict,
+    route_cache: dict,
+    use_walk_api: bool = False,
+) -> dict:
+    """
+    Find the nearest MRT station to one location and the public transport
+    route to it, and the walking route too if use_walk_api is set.
+    """
+    result = {
+        'Nearest_MRT': '',
+        'MRT_Station_Code': '',
+        'MRT_Distance_m': 0.0,
+        'Walk_Distance_m': 0.0,
+        'Walk_Duration_min': 0.0,
+        'bus_duration_min': 0.0,
+    }
 
-        if nearest_mrt:
-            df.at[idx, 'Nearest_MRT'] = nearest_mrt['name']
-            df.at[idx, 'MRT_Station_Code'] = nearest_mrt.get('code', '')
-            df.at[idx, 'MRT_Distance_m'] = round(nearest_mrt['distance_meters'], 1)
+    nearest_mrt = get_nearest_mrt(lat, lon, stations)
+    if not nearest_mrt:
+        logger.warning('No MRT station found within search radius of %s', project_name)
+        return result
+
+    result['Nearest_MRT'] = nearest_mrt['name']
+    result['MRT_Station_Code'] = nearest_mrt.get('code', '')
+    result['MRT_Distance_m'] = round(nearest_mrt['distance_meters'], 1)
+
+    def fetch_route(route_type, get_route_info):
+        return get_cached_route(
+            route_type,
+            lat,
+            lon,
+            nearest_mrt['code'],
+            route_cache=route_cache,
+            fetch_route=lambda: get_route_info(
+                lat,
+                lon,
+                nearest_mrt['latitude'],
+                nearest_mrt['longitude'],
+                session=session,
+                headers=route_headers,
+            ),
+        )
+
+    def fetch_routes():
+        if not use_walk_api:
+            return fetch_route('pt', get_route_info_pt), None
+        # OneMap plans one route type per request, so send the walking and
+        # public transport requests together rather than one after the other
+        with ThreadPoolExecutor(max_workers=1) as walk_executor:
+            walk_future = walk_executor.submit(fetch_route, 'walk', get_route_info_walk)
+            pt_route = fetch_route('pt', get_route_info_pt)
+            return pt_route, walk_future.result()
 
-            print(
-                f'  Nearest MRT: {nearest_mrt["name"]} ({nearest_mrt.get("code", "")}) - {round(nearest_mrt["distance_meters"], 0)}m'
-            )
+    try:
+        pt_route, walk_route = fetch_routes()
+    except (KeyError, IndexError, ValueError) as e:
+        # A malformed or empty route response would fail again on every rerun,
+        # so keep the station found locally and leave only the routes empty
+        logger.warning('Bad OneMap route response for %s: %s', project_name, e)
+        result['bus_duration_min'] = np.nan
+        if use_walk_api:
+            result['Walk_Distance_m'] = np.nan
+            result['Walk_Duration_min'] = np.nan
+        return result
+
+    if use_walk_api:
+        result['Walk_Distance_m'] = round(float(walk_route['distance_meters']), 1)
+        result['Walk_Duration_min'] = walk_route['duration_minutes']
+        walking = f'walking {walk_route["duration_minutes"]} min, '
+    else:
+        walking = ''
+
+    result['bus_duration_min'] = pt_route['duration_minutes']
+
+    logger.debug(
+        '%s: %s (%s) - %.0fm, %spublic transport %s min',
+        project_name,
+        nearest_mrt['name'],
+        nearest_mrt.get('code', ''),
+        nearest_mrt['distance_meters'],
+        walking,
+        pt_route['duration_minutes'],
+    )
+    return result
+
+
+def process_csv(
+    input_file: str,
+    output_file: str,
+    route_headers: dict,
+    *,
+    session: requests.Session,
+    stations: dict,
+    route_cache: dict,
+    executor: ThreadPoolExecutor,
+    use_walk_api: bool = False,
+):
+    """
+    Process the CSV file and add nearest MRT station information.
+    Rows are processed concurrently on the shared executor, so the OneMap
+    round trips of different rows, and of different files, overlap instead
+    of being paid one after another.
+    Walking routes are estimated from the straight-line distance unless
+    use_walk_api is set, which is meant for checking the estimate.
+    Each finished row is appended to a partial results file next to the
+    output, so a rerun after a crash only processes the remaining rows.
+    Rows whose requests fail after the session's retries are left out of
+    that file, and the output is only written once none of them are left.
+    Rows with an unusable route response are kept with empty route columns.
+    """
+    logger.info('Loading %s...', input_file)
+    df = pd.read_csv(input_file, dtype=ESTATE_DTYPES)
 
-            # Get walking route
-            print('  Getting walking route...')
-            walk_route = get_route_info_walk(
-                lat, lon, nearest_mrt['latitude'], nearest_mrt['longitude'], token
-            )
-            df.at[idx, 'Walk_Distance_m'] = round(walk_route['distance_meters'], 1)
-            df.at[idx, 'Walk_Duration_min'] = walk_route['duration_minutes']
-
-            # Get public transport route
-            print('  Getting public transport route...')
-            time.sleep(0.5)  # Rate limiting
-            pt_route = get_route_info_pt(
-                lat, lon, nearest_mrt['latitude'], nearest_mrt['longitude'], token
-            )
-            df.at[idx, 'bus_duration_min'] = pt_route['duration_minutes']
+    partial_file = Path(output_file + '.partial.jsonl')
+    done = load_partial_results(partial_file)
 
-            print(f'  Walking: {walk_route["duration_minutes"]} min')
-            print(f'  Public Transport: {pt_route["duration_minutes"]} min')
-        else:
-            print(f'  Warning: No MRT station found within search radius')
+    rows = list(
+        df[['Latitude', 'Longitude', 'Project Name']].itertuples(index=False, name=None)
+    )
+    pending = [row for row in rows if row not in done]
+    logger.info(
+        'Processing %d locations from %s (%d already done)...',
+        len(pending),
+        input_file,
+        len(rows) - len(pending),
+    )
 
-        # Small delay to avoid overwhelming the API
-        time.sleep(0.5)
+    def try_process_row(row):
+        try:
+            return process_row(
+                *row,
+                route_headers,
+                session=session,
+                stations=stations,
+                route_cache=route_cache,
+                use_walk_api=use_walk_api,
+            )
+        except requests.RequestException as e:
+            # Transient: left out of the partial results so a rerun retries it
+            logger.warning('Failed to process %s: %s', row[2], e)
+            return None
+
+    failed = 0
+    processed = executor.map(try_process_row, pending)
+    with open(partial_file, 'a') as partial:
+        for count, (row, result) in enumerate(
+            zip(pending, processed, strict=True), start=1
+        ):
+            if result is None:
+                failed += 1
+                continue
+            partial.write(json.dumps({'key': row, 'result': result}) + '\n')
+            partial.flush()
+            done[row] = result
+            if count % PROGRESS_EVERY == 0:
+                logger.info('%s: %d/%d locations done', input_file, count, len(pending))
+
+    if failed:
+        logger.warning(
+            '%s: %d locations failed, rerun to retry them', input_file, failed
+        )
+        return
+    results = [done[row] for row in rows]
+
+    # Add every new column in one concat
+    df = pd.concat([df, pd.DataFrame(results, index=df.index)], axis=1)
+
+    if not use_walk_api:
+        walk_distance = df['MRT_Distance_m'] * WALK_DETOUR_FACTOR
+        df['Walk_Distance_m'] = walk_distance.round(1)
+        df['Walk_Duration_min'] = (walk_distance / WALK_SPEED_M_PER_MIN).round(1)
 
     # Save results
-    print(f'\nSaving results to {output_file}...')
-    df.to_csv(output_file, index=False)
-    print('Done!')
-
-    # Print summary
-    print('\n' + '=' * 60)
-    print('SUMMARY')
-    print('=' * 60)
-    print(f'Total locations processed: {len(df)}')
-    print(
-        f'\nAverage walking time to MRT: {df["Walk_Duration_min"].mean():.1f} minutes'
-    )
-    print(
-        f'Average public transport time to MRT: {df["bus_duration_min"].mean():.1f} minutes'
-    )
-    print(
-        f'Average straight-line distance to MRT: {df["MRT_Distance_m"].mean():.0f} meters'
-    )
-    print('\nClosest to MRT:')
-    closest = df.loc[df['MRT_Distance_m'].idxmin()]
-    print(
-        f'  {closest["Project Name"]}: {closest["MRT_Distance_m"]:.0f}m to {closest["Nearest_MRT"]}'
-    )
-    print('\nFarthest from MRT:')
-    farthest = df.loc[df['MRT_Distance_m'].idxmax()]
-    print(
-        f'  {farthest["Project Name"]}: {farthest["MRT_Distance_m"]:.0f}m to {farthest["Nearest_MRT"]}'
-    )
+    # Write to a temporary file first: an existing output counts as done, so
+    # a crash mid-write must not leave a truncated one behind
+    logger.info('Saving results to %s...', output_file)
+    tmp_file = output_file + '.tmp'
+    df.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, output_file)
+    partial_file.unlink()
+
+    # Print summary as one block so summaries of concurrent files don't mix
+    summary = [
+        '',
+        '=' * 60,
+        f'SUMMARY: {input_file}',
+        '=' * 60,
+        f'Total locations processed: {len(df)}',
+        '',
+        f'Average walking time to MRT: {df["Walk_Duration_min"].mean():.1f} minutes',
+        f'Average public transport time to MRT: {df["bus_duration_min"].mean():.1f} minutes',
+        f'Average straight-line distance to MRT: {df["MRT_Distance_m"].mean():.0f} meters',
+    ]
+    # Rows without a distance, e.g. from an older run, are left out here
+    distances = df['MRT_Distance_m'].dropna()
+    if not distances.empty:
+        closest = df.loc[distances.idxmin()]
+        farthest = df.loc[distances.idxmax()]
+        summary += [
+            '',
+            'Closest to MRT:',
+            f'  {closest["Project Name"]}: {closest["MRT_Distance_m"]:.0f}m to {closest["Nearest_MRT"]}',
+            '',
+            'Farthest from MRT:',
+            f'  {farthest["Project Name"]}: {farthest["MRT_Distance_m"]:.0f}m to {farthest["Nearest_MRT"]}',
+        ]
+    print('\n'.join(summary))
 
 
 if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s'
+    )
+
     by_estate_dir = Path('data/by_estate')
 
+    estate_files = []
     for estate_file in by_estate_dir.rglob('*.csv'):
-        print(f'\nProcessing estate file: {estate_file}')
         input_file = str(estate_file)
         output_file = input_file.replace('by_estate', 'by_estate_mrt')
         Path(output_file).parent.mkdir(parents=True, exist_ok=True)
         if Path(output_file).exists():
-            print(f'{output_file} exists, skipping...')
+            logger.info('%s exists, skipping...', output_file)
             continue
-        process_csv(input_file, output_file)
+        estate_files.append((input_file, output_file))
+
+    # Read the OneMap token once and build the request headers from it
+    token = get_onemap_token()
+    nearby_headers = {'Authorization': f'Bearer {token}'} if token else {}
+    route_headers = {'Authorization': token}
+
+    # All files share one session, station list, route cache and row pool
+    route_cache = load_route_cache()
+    try:
+        with (
+            create_session() as session,
+            ThreadPoolExecutor(max_workers=MAX_WORKERS) as row_executor,
+            ThreadPoolExecutor(max_workers=MAX_FILE_WORKERS) as file_executor,
+        ):
+            warm_up_session(session, nearby_headers)
+            stations = load_mrt_stations(nearby_headers, session)
+            list(
+                file_executor.map(
+                    lambda files: process_csv(
+                        *files,
+                        route_headers,
+                        session=session,
+                        stations=stations,
+                        route_cache=route_cache,
+                        executor=row_executor,
+                    ),
+                    estate_files,
+                )
+            )
+    finally:
+        # Keep the routes fetched so far even if a file failed. The executors
+        # have shut down by now, so no row is still adding to the cache.
+        save_route_cache(route_cache)
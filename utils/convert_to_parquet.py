@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Script to convert the estate and project CSV files into Parquet files.
+The app reads the Parquet files directly, so column names and dtypes are
+normalised once here instead of on every cold start.
+Re-run after any CSV under data/ is regenerated.
+"""
+
+from pathlib import Path
+
+import pandas as pd
+
+ROOM_COLUMNS = ['2-room Flexi', '3-room', '3Gen', '4-room', '5-room', 'Executive']
+COORDINATE_COLUMNS = ['Latitude', 'Longitude']
+
+
+def convert_estate_csv(csv_file: Path) -> Path:
+    """
+    Convert an estate CSV to Parquet with fixed room count and coordinate dtypes.
+    Room columns missing from the CSV are added as zeros so every estate file
+    shares the same schema.
+    """
+    df = pd.read_csv(csv_file, engine='pyarrow')
+    df.columns = df.columns.str.strip()
+
+    missing = [col for col in ROOM_COLUMNS if col not in df.columns]
+    df[missing] = 0
+    df[ROOM_COLUMNS] = (
+        df[ROOM_COLUMNS].apply(pd.to_numeric, errors='coerce').fillna(0).astype('int32')
+    )
+
+    df[COORDINATE_COLUMNS] = df[COORDINATE_COLUMNS].astype('float32')
+
+    parquet_file = csv_file.with_suffix('.parquet')
+    df.to_parquet(parquet_file, compression='zstd', index=False)
+    return parquet_file
+
+
+def convert_project_csv(csv_file: Path) -> Path:
+    """
+    Convert a project floor/price CSV to Parquet.
+    price_range is read as a string so projects without any prices keep the
+    same schema as the rest.
+    """
+    df = pd.read_csv(csv_file, engine='pyarrow', dtype={'price_range': 'string'})
+    df.columns = df.columns.str.strip()
+
+    parquet_file = csv_file.with_suffix('.parquet')
+    df.to_parquet(parquet_file, compression='zstd', index=False)
+    return parquet_file
+
+
+if __name__ == '__main__':
+    by_estate_dir = Path('data/by_estate_mrt')
+    by_project_dir = Path('data/by_project')
+
+    for estate_file in by_estate_dir.rglob('*.csv'):
+        print(f'Converting estate file: {estate_file}')
+        convert_estate_csv(estate_file)
+
+    for project_file in by_project_dir.rglob('*.csv'):
+        print(f'Converting project file: {project_file}')
+        convert_project_csv(project_file)